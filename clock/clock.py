@@ -1,6 +1,10 @@
-from threading import Thread, Timer, Event
+from threading import Thread, Event
+import logging
+import sys
 import time
 
+logger = logging.getLogger(__name__)
+
 class ClockDevice:
     """硬件时钟：定期向CPU发送中断信号（纯硬件行为）"""
     def __init__(self, interval=1):
@@ -8,22 +12,42 @@ class ClockDevice:
         self.interval = interval  # 中断间隔（秒）
         self.running = False
         self.ticks = 0
+        self._stop_event = Event()  # 停止信号：同时用于定时等待与取消
+        self._winmm = None  # Windows 多媒体定时器库（仅 win32 下加载）
 
     def set_cpu(self, cpu):
         self.cpu = cpu
 
     def start(self):
         self.running = True
-        Thread(target=self._tick, daemon=True).start()
-        print(f"[时钟硬件] 启动，间隔 {self.interval} 秒")
+        self._stop_event.clear()
+        if sys.platform == "win32" and self._winmm is None:
+            # Windows 默认定时器粒度约15.6ms，运行期间提升到1ms以减少中断抖动
+            import ctypes
+            self._winmm = ctypes.WinDLL("winmm")
+            self._winmm.timeBeginPeriod(1)
+        Thread(target=self._run, daemon=True).start()
+        logger.debug("[时钟硬件] 启动，间隔 %s 秒", self.interval)
 
     def stop(self):
         self.running = False
+        self._stop_event.set()
+        if self._winmm is not None:
+            self._winmm.timeEndPeriod(1)
+            self._winmm = None
 
-    def _tick(self):
-        while self.running:
-            time.sleep(self.interval)
-            self.ticks += 1
+    def _run(self):
+        """单线程时钟循环：按绝对截止时间等待，避免 sleep 累积漂移"""
+        deadline = time.monotonic()
+        while True:
+            deadline += self.interval
+            remaining = deadline - time.monotonic()
+            if self._stop_event.wait(remaining if remaining > 0 else 0):
+                return
+            # 唤醒延迟超过一个周期时，将错过的滴答合并为一次中断（滴答数照常累计）
+            missed = 1 + int((time.monotonic() - deadline) / self.interval)
+            deadline += (missed - 1) * self.interval
+            self.ticks += missed
             if self.cpu:
                 # 硬件级：直接触发CPU的中断引脚（模拟硬件信号）
-                self.cpu.receive_hardware_interrupt("clock", self.ticks)
\ No newline at end of file
+                self.cpu.receive_hardware_interrupt("clock", self.ticks)
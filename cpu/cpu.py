@@ -1,29 +1,94 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 寄存器引用模式（如 R0、R10）：整体匹配，避免 "R1" 误替换 "R10" 的前缀
+_REG_PATTERN = re.compile(r"\bR\d+\b", re.ASCII)
+
+# 寄存器组布局：16个通用寄存器 R0~R15，按名称映射到固定下标
+REG_NAMES = tuple(f"R{i}" for i in range(16))
+REG_INDEX = {name: i for i, name in enumerate(REG_NAMES)}
+# 条件标志布局：[ZF, CF]（零标志、进位标志）
+FLAG_NAMES = ("ZF", "CF")
+ZF, CF = range(len(FLAG_NAMES))
+# 上下文帧池容量（中断/系统调用保存上下文时复用，避免热路径分配）
+CTX_POOL_SIZE = 8
+
+
+class MemoryAccessError(Exception):
+    """内存寻址越界（映射为 memory_access 内中断；其他 IndexError 仍视为无效指令）"""
+
+
+class ContextFrame:
+    """进程上下文帧：寄存器、标志、PC、特权级（固定槽位，可复用）"""
+    __slots__ = ("registers", "flags", "pc", "cpsr")
+
+    def __init__(self, cpsr="user"):
+        self.registers = [0] * len(REG_NAMES)
+        self.flags = [0] * len(FLAG_NAMES)
+        self.pc = 0
+        self.cpsr = cpsr
+
+
 class CPU:
     def __init__(self, kernel):
         self.kernel = kernel
-        self.registers = {}  # 通用寄存器：{"R0": 100, "R1": 200}
-        self.flags = {}  # 条件标志：{"ZF": 0, "CF": 0}（零标志、进位标志）
+        self.registers = [0] * len(REG_NAMES)  # 通用寄存器：下标见 REG_INDEX（"R0"→0）
+        self.flags = [0] * len(FLAG_NAMES)  # 条件标志：[ZF, CF]
         self.pc = 0  # 程序计数器
         self.cpsr = "user"  # 状态寄存器（user/kernel）
         self.interrupt_enabled = True
+        self._ctx_pool = [ContextFrame() for _ in range(CTX_POOL_SIZE)]  # 空闲上下文帧
+        self._memory = None  # 内核内存（由 attach_memory 绑定）
+        # 指令分发表：{操作码: 处理方法}（初始化时构建一次，执行时单次查表）
+        self._dispatch = {
+            "MOV": self._op_mov,
+            "ADD": self._op_add,
+            "DIV": self._op_div,
+            "SYSCALL": self._op_syscall,
+            "GET_PROCESS_COUNT": self._op_get_process_count,
+            "PRINT": self._op_print,
+            "LOG": self._op_log,
+            "NOP": self._op_nop
+        }
+        # 寻址方式分发表：{寻址方式: 解析方法}
+        self._resolver = {
+            "register": self._resolve_reg,
+            "immediate": self._resolve_imm,
+            "memory": self._resolve_mem
+        }
+
+    def attach_memory(self, memory):
+        """绑定内核内存（内存对象替换时需重新调用）"""
+        self._memory = memory
 
     def set_mode(self, mode):
         if mode in ["user", "kernel"] and self.cpsr != mode:
             self.cpsr = mode
-            print(f"[CPU硬件] 特权级切换：{mode}")
+            logger.debug("[CPU硬件] 特权级切换：%s", mode)
 
     def _resolve_operand(self, operand, addressing_mode):
-        """解析操作数（根据寻址方式获取实际值）"""
-        if addressing_mode == "register":
-            return self.registers.get(operand, 0)
-        elif addressing_mode == "immediate":
-            return operand
-        elif addressing_mode == "memory":
-            # 简化内存寻址：内存地址对应内核memory字典
-            mem_addr = self.registers.get(operand, 0)
-            return self.kernel.memory.get(mem_addr, 0)
-        else:
+        """解析操作数（根据寻址方式查表获取实际值）"""
+        resolver = self._resolver.get(addressing_mode)
+        if resolver is None:
             raise ValueError(f"不支持的寻址方式：{addressing_mode}")
+        return resolver(operand)
+
+    def _resolve_reg(self, operand):
+        """寄存器寻址：读取寄存器值"""
+        return self.registers[REG_INDEX[operand]]
+
+    def _resolve_imm(self, operand):
+        """立即数寻址：操作数即为值"""
+        return operand
+
+    def _resolve_mem(self, operand):
+        """内存寻址：寄存器值作为地址（简化内存寻址：地址即内核memory数组下标）"""
+        mem_addr = self.registers[REG_INDEX[operand]]
+        if not 0 <= mem_addr < len(self._memory):
+            raise MemoryAccessError(f"内存地址越界：{mem_addr}")
+        return self._memory[mem_addr]
 
     def execute_instruction(self, instr):
         # ------------------------------
@@ -33,117 +98,11 @@ class CPU:
             self.raise_exception("privilege_violation", instr)
             return
 
+        # ------------------------------
+        # 2. 指令执行逻辑（查表分发到对应处理方法）
+        # ------------------------------
         try:
-            # ------------------------------
-            # 工具函数：减少重复代码
-            # ------------------------------
-            def check_operand_count(expected):
-                """校验指令操作数数量，不符则抛异常"""
-                if len(instr.operands) != expected:
-                    raise ValueError(f"{instr.opcode}指令需{expected}个操作数")
-
-            def replace_register_content(content):
-                """替换字符串中的寄存器引用（如"R0"→实际值）"""
-                for reg, val in self.registers.items():
-                    content = content.replace(reg, str(val))
-                return content
-
-            # ------------------------------
-            # 2. 指令执行逻辑（按功能分类，精简代码）
-            # ------------------------------
-            match instr.opcode:
-                # ------------------------------
-                # 数据传输指令：MOV
-                # ------------------------------
-                case "MOV":
-                    check_operand_count(2)
-                    dst, src = instr.operands
-                    dst_mode, src_mode = instr.addressing_modes
-                    src_val = self._resolve_operand(src, src_mode)
-                    self.registers[dst] = src_val
-                    print(f"[CPU硬件] 执行指令：{instr} → {dst}={src_val}（PC={self.pc}）")
-
-                # ------------------------------
-                # 算术运算指令：ADD / DIV
-                # ------------------------------
-                case "ADD":
-                    check_operand_count(3)
-                    dst, op1, op2 = instr.operands
-                    op1_val = self._resolve_operand(op1, instr.addressing_modes[1])
-                    op2_val = self._resolve_operand(op2, instr.addressing_modes[2])
-                    self.registers[dst] = op1_val + op2_val
-                    print(f"[CPU硬件] 执行指令：{instr} → {dst}={op1_val}+{op2_val}={self.registers[dst]}（PC={self.pc}）")
-                    # 条件码更新（CC标志）
-                    if "CC" in instr.flags:
-                        self.flags["ZF"] = 1 if self.registers[dst] == 0 else 0
-                        print(f"[CPU硬件] 更新条件码：ZF={self.flags['ZF']}")
-
-                case "DIV":
-                    check_operand_count(3)
-                    dst, divd, divr = instr.operands
-                    divd_val = self._resolve_operand(divd, instr.addressing_modes[1])
-                    divr_val = self._resolve_operand(divr, instr.addressing_modes[2])
-                    print(f"[CPU硬件] 执行指令：{instr} → {dst}={divd_val}/{divr_val}（PC={self.pc}）")
-                    if divr_val == 0:
-                        raise ZeroDivisionError("除数为0")
-                    self.registers[dst] = divd_val // divr_val
-
-                # ------------------------------
-                # 系统调用指令：SYSCALL（核心逻辑保留）
-                # ------------------------------
-                case "SYSCALL":
-                    check_operand_count(2)
-                    syscall_name, result_reg = instr.operands
-                    print(f"[CPU硬件] 用户态发起系统调用：{syscall_name}（结果存{result_reg}，PC={self.pc}）")
-
-                    # 1. 保存用户态上下文
-                    user_context = {
-                        "registers": self.registers.copy(),
-                        "flags": self.flags.copy(),
-                        "pc": self.pc,
-                        "cpsr": self.cpsr
-                    }
-                    # 2. 切内核态→调用内核处理→写结果→切回用户态
-                    self.set_mode("kernel")
-                    sys_result = self.kernel.handle_syscall(syscall_name, user_context)
-                    self.registers[result_reg] = sys_result
-                    print(f"[CPU硬件] 系统调用返回结果：{result_reg}={sys_result}")
-                    self.set_mode("user")
-
-                # ------------------------------
-                # 内核专用指令：GET_PROCESS_COUNT
-                # ------------------------------
-                case "GET_PROCESS_COUNT":
-                    check_operand_count(1)
-                    result_reg = instr.operands[0]
-                    count = len(self.kernel.pcbs)
-                    self.registers[result_reg] = count
-                    print(f"[CPU硬件] 执行内核指令：{instr} → {result_reg}={count}（PC={self.pc}）")
-
-                # ------------------------------
-                # 输出指令：PRINT（用户态） / LOG（内核态）
-                # ------------------------------
-                case "PRINT":
-                    check_operand_count(1)
-                    content = replace_register_content(instr.operands[0])
-                    print(f"[用户进程输出] {content}（PC={self.pc}）")
-
-                case "LOG":
-                    check_operand_count(1)
-                    content = replace_register_content(instr.operands[0])
-                    print(f"[内核日志] {content}（PC={self.pc}）")
-
-                # ------------------------------
-                # 空指令：NOP
-                # ------------------------------
-                case "NOP":
-                    print(f"[CPU硬件] 执行指令：{instr}（PC={self.pc}）")
-
-                # ------------------------------
-                # 未知指令
-                # ------------------------------
-                case _:
-                    raise ValueError(f"未知指令：{instr.opcode}")
+            self._dispatch.get(instr.opcode, self._op_unknown)(instr)
 
         # ------------------------------
         # 3. 异常处理（精简捕获逻辑）
@@ -151,6 +110,9 @@ class CPU:
         except ZeroDivisionError:
             self.raise_exception("divide_by_zero", instr)
             return
+        except MemoryAccessError as e:
+            self.raise_exception("memory_access", f"{instr}（错误：{str(e)}）")
+            return
         except Exception as e:
             err_msg = f"{instr}（错误：{str(e)}）"
             self.raise_exception("invalid_instruction", err_msg)
@@ -161,35 +123,169 @@ class CPU:
         # ------------------------------
         self.pc += 1
 
+    # ------------------------------
+    # 工具函数：减少重复代码
+    # ------------------------------
+    def _check_operands(self, instr, expected):
+        """校验指令操作数数量，不符则抛异常"""
+        if len(instr.operands) != expected:
+            raise ValueError(f"{instr.opcode}指令需{expected}个操作数")
+
+    def _expand_regs(self, content):
+        """替换字符串中的寄存器引用（如"R0"→实际值，不存在的寄存器名原样保留）"""
+        return _REG_PATTERN.sub(self._reg_text, content)
+
+    def _reg_text(self, match):
+        """正则替换回调：寄存器名→当前值的文本"""
+        idx = REG_INDEX.get(match.group())
+        return match.group() if idx is None else str(self.registers[idx])
+
+    # ------------------------------
+    # 数据传输指令：MOV
+    # ------------------------------
+    def _op_mov(self, instr):
+        self._check_operands(instr, 2)
+        dst, src = instr.operands
+        dst_mode, src_mode = instr.addressing_modes
+        src_val = self._resolve_operand(src, src_mode)
+        self.registers[REG_INDEX[dst]] = src_val
+        logger.debug("[CPU硬件] 执行指令：%s → %s=%s（PC=%s）", instr, dst, src_val, self.pc)
+
+    # ------------------------------
+    # 算术运算指令：ADD / DIV
+    # ------------------------------
+    def _op_add(self, instr):
+        self._check_operands(instr, 3)
+        dst, op1, op2 = instr.operands
+        op1_val = self._resolve_operand(op1, instr.addressing_modes[1])
+        op2_val = self._resolve_operand(op2, instr.addressing_modes[2])
+        result = op1_val + op2_val
+        self.registers[REG_INDEX[dst]] = result
+        logger.debug("[CPU硬件] 执行指令：%s → %s=%s+%s=%s（PC=%s）", instr, dst, op1_val, op2_val, result, self.pc)
+        # 条件码更新（CC标志）
+        if "CC" in instr.flags:
+            self.flags[ZF] = 1 if result == 0 else 0
+            logger.debug("[CPU硬件] 更新条件码：ZF=%s", self.flags[ZF])
+
+    def _op_div(self, instr):
+        self._check_operands(instr, 3)
+        dst, divd, divr = instr.operands
+        divd_val = self._resolve_operand(divd, instr.addressing_modes[1])
+        divr_val = self._resolve_operand(divr, instr.addressing_modes[2])
+        logger.debug("[CPU硬件] 执行指令：%s → %s=%s/%s（PC=%s）", instr, dst, divd_val, divr_val, self.pc)
+        if divr_val == 0:
+            raise ZeroDivisionError("除数为0")
+        self.registers[REG_INDEX[dst]] = divd_val // divr_val
+
+    # ------------------------------
+    # 系统调用指令：SYSCALL（核心逻辑保留）
+    # ------------------------------
+    def _op_syscall(self, instr):
+        self._check_operands(instr, 2)
+        syscall_name, result_reg = instr.operands
+
+        # 0. vDSO快速路径：只读查询直接在用户态完成，跳过上下文保存与特权级切换
+        vdso_call = self.kernel.vdso.get(syscall_name)
+        if vdso_call:
+            sys_result = vdso_call()
+            self.registers[REG_INDEX[result_reg]] = sys_result
+            logger.debug("[CPU硬件] vDSO系统调用：%s → %s=%s（PC=%s）", syscall_name, result_reg, sys_result, self.pc)
+            return
+
+        logger.debug("[CPU硬件] 用户态发起系统调用：%s（结果存%s，PC=%s）", syscall_name, result_reg, self.pc)
+
+        # 1. 保存用户态上下文
+        user_context = self._save_context()
+        # 2. 切内核态→调用内核处理→写结果→切回用户态
+        self.set_mode("kernel")
+        sys_result = self.kernel.handle_syscall(syscall_name, user_context)
+        self._release_context(user_context)  # 内核不持有系统调用上下文，直接归还
+        self.registers[REG_INDEX[result_reg]] = sys_result
+        logger.debug("[CPU硬件] 系统调用返回结果：%s=%s", result_reg, sys_result)
+        self.set_mode("user")
+
+    # ------------------------------
+    # 内核专用指令：GET_PROCESS_COUNT
+    # ------------------------------
+    def _op_get_process_count(self, instr):
+        self._check_operands(instr, 1)
+        result_reg = instr.operands[0]
+        count = len(self.kernel.pcbs)
+        self.registers[REG_INDEX[result_reg]] = count
+        logger.debug("[CPU硬件] 执行内核指令：%s → %s=%s（PC=%s）", instr, result_reg, count, self.pc)
+
+    # ------------------------------
+    # 输出指令：PRINT（用户态） / LOG（内核态）
+    # ------------------------------
+    def _op_print(self, instr):
+        self._check_operands(instr, 1)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("[用户进程输出] %s（PC=%s）", self._expand_regs(instr.operands[0]), self.pc)
+
+    def _op_log(self, instr):
+        self._check_operands(instr, 1)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("[内核日志] %s（PC=%s）", self._expand_regs(instr.operands[0]), self.pc)
+
+    # ------------------------------
+    # 空指令：NOP
+    # ------------------------------
+    def _op_nop(self, instr):
+        logger.debug("[CPU硬件] 执行指令：%s（PC=%s）", instr, self.pc)
+
+    # ------------------------------
+    # 未知指令
+    # ------------------------------
+    def _op_unknown(self, instr):
+        raise ValueError(f"未知指令：{instr.opcode}")
+
+    # ------------------------------
+    # 上下文帧：保存/归还（池空时新建，池满时丢弃）
+    # ------------------------------
+    def _save_context(self):
+        """从上下文池取一帧，原地写入当前CPU状态"""
+        # 时钟线程与主线程可能同时取帧，先判空再 pop 存在竞态，直接 pop 并兜底
+        try:
+            frame = self._ctx_pool.pop()
+        except IndexError:
+            frame = ContextFrame()
+        frame.registers[:] = self.registers
+        frame.flags[:] = self.flags
+        frame.pc = self.pc
+        frame.cpsr = self.cpsr
+        return frame
+
+    def _release_context(self, frame):
+        """将不再使用的上下文帧归还到池中"""
+        if len(self._ctx_pool) < CTX_POOL_SIZE:
+            self._ctx_pool.append(frame)
+
     def receive_hardware_interrupt(self, interrupt_type, data):
         """处理硬件中断（如时钟中断）"""
         if not self.interrupt_enabled:
             return
-        current_context = {
-            "registers": self.registers.copy(),
-            "flags": self.flags.copy(),
-            "pc": self.pc,
-            "cpsr": self.cpsr
-        }
+        current_context = self._save_context()
         self.set_mode("kernel")
         self.kernel.handle_interrupt(interrupt_type, data, current_context)
 
     def raise_exception(self, exception_type, data):
-        """处理内中断（异常：特权违规、除零、无效指令）"""
-        current_context = {
-            "registers": self.registers.copy(),
-            "flags": self.flags.copy(),
-            "pc": self.pc,
-            "cpsr": self.cpsr
-        }
+        """处理内中断（异常：特权违规、除零、无效指令、非法内存访问）"""
+        current_context = self._save_context()
         self.set_mode("kernel")
-        print(f"[CPU硬件] 触发内中断：{exception_type}（原因：{data}）")
+        logger.debug("[CPU硬件] 触发内中断：%s（原因：%s）", exception_type, data)
         self.kernel.handle_exception(exception_type, data, current_context)
 
     def load_context(self, context):
-        """加载进程上下文（进程切换时使用）"""
-        self.registers = context["registers"].copy()
-        self.flags = context.get("flags", {}).copy()
-        self.pc = context["pc"]
-        self.set_mode(context["cpsr"])
-        print(f"[CPU硬件] 加载上下文：PC={self.pc}，标志={self.flags}")
+        """加载进程上下文（进程切换时使用）：直接接管帧内的寄存器/标志，并将帧归还到池中"""
+        # 与帧交换列表而非复制：恢复后进程即在运行，其保存的上下文不再被读取
+        self.registers, context.registers = context.registers, self.registers
+        self.flags, context.flags = context.flags, self.flags
+        self.pc = context.pc
+        self.set_mode(context.cpsr)
+        self._release_context(context)
+        logger.debug("[CPU硬件] 加载上下文：PC=%s，标志=%s", self.pc, self.flags)
+
+    def resume_context(self, context):
+        """中断返回且未切换进程：寄存器/标志/PC在中断处理期间未被改动，只恢复特权级并归还帧"""
+        self.set_mode(context.cpsr)
+        self._release_context(context)
@@ -1,12 +1,20 @@
+import sys
+
+
 class Instruction:
+    __slots__ = ("mode", "opcode", "operands", "addressing_modes", "flags", "_repr")
+
     def __init__(self, mode, opcode, operands=None, addressing_modes=None, flags=None):
-        self.mode = mode  # 特权级："user"/"kernel"
-        self.opcode = opcode  # 操作码："MOV"/"ADD"/"SYSCALL"/"GET_PROCESS_COUNT"
+        self.mode = sys.intern(mode)  # 特权级："user"/"kernel"
+        self.opcode = sys.intern(opcode)  # 操作码："MOV"/"ADD"/"SYSCALL"/"GET_PROCESS_COUNT"（驻留后分发查表走指针比较）
         self.operands = operands or []  # 多操作数列表：如SYSCALL的["get_process_count", "R0"]
         self.addressing_modes = addressing_modes or []  # 寻址方式：["register", "immediate"]
         self.flags = flags or []  # 条件标志：["TRAP"（系统调用陷阱）, "CC"（更新条件码）]
+        self._repr = None  # 文本表示缓存（指令构造后不再修改，首次输出时生成）
 
     def __repr__(self):
+        if self._repr is not None:
+            return self._repr
         parts = [f"[{self.mode}] {self.opcode}"]
         if self.operands:
             parts.append(", ".join(map(str, self.operands)))
@@ -14,4 +22,5 @@ class Instruction:
             parts.append(f"（寻址：{self.addressing_modes}）")
         if self.flags:
             parts.append(f"（标志：{self.flags}）")
-        return " ".join(parts)
\ No newline at end of file
+        self._repr = " ".join(parts)
+        return self._repr
@@ -1,10 +1,20 @@
+from collections import deque
 from threading import Event
+import array
+import bisect
+import logging
+import os
+import sys
 import time
 
 from clock.clock import ClockDevice
-from cpu.cpu import CPU
+from cpu.cpu import CPU, REG_INDEX
 from instructions.instruction import Instruction
-from process.process import PCB, KernelProcess, UserProcess
+from process.process import PCB, KernelProcess, UserProcess, PState
+
+logger = logging.getLogger(__name__)
+
+MEM_SIZE = 1024  # 模拟内存单元数（每单元为64位有符号整数）
 
 # ------------------------------
 # 调度器（Scheduler）
@@ -12,32 +22,112 @@ from process.process import PCB, KernelProcess, UserProcess
 class Scheduler:
     def __init__(self, kernel):
         self.kernel = kernel
-        self.ready_queue = []
+        # 多级就绪队列：{优先级: 双端队列}，优先级数字越小越先调度，同级按入队先后轮转
+        self.queues = {1: deque(), 3: deque(), 5: deque()}
+        self._levels = sorted(self.queues)  # 按调度先后排列的优先级（出现新优先级时插入）
+        self.alive_pids = set()  # 未终止进程的PID集合：出队时据此惰性丢弃过期条目
+        self.resident_pcb = None  # 常驻进程PCB（队列为空时兜底调度，由内核创建时设置）
+        self._in_queue = set()  # 已在就绪队列中的PCB（按 id 记录），O(1) 成员判断
 
     def add_ready_process(self, pcb):
-        pcb.state = "ready"
-        self.ready_queue.append(pcb)
-        print(f"[调度器] 进程 {pcb.process.pid} 进入就绪队列")
+        pid = pcb.process.pid
+        pcb.state = PState.READY
+        self.alive_pids.add(pid)
+        self._push(pcb)
+        logger.debug("[调度器] 进程 %s 进入就绪队列", pid)
+
+    def _push(self, pcb):
+        if id(pcb) in self._in_queue:
+            return  # 已在队列中，避免重复入队
+        self._in_queue.add(id(pcb))
+        queue = self.queues.get(pcb.priority)
+        if queue is None:
+            queue = self.queues[pcb.priority] = deque()
+            bisect.insort(self._levels, pcb.priority)
+        queue.append(pcb)
+
+    def _pop(self):
+        """从最高优先级的非空队列取出队首存活进程；全部为空返回None"""
+        # 惰性删除：已终止进程的条目留在队列中，到达队首时才丢弃
+        alive_pids = self.alive_pids
+        for level in self._levels:
+            queue = self.queues[level]
+            while queue:
+                pcb = queue.popleft()
+                self._in_queue.discard(id(pcb))
+                if pcb.process.pid in alive_pids:
+                    return pcb
+        return None
+
+    def is_queued(self, pcb):
+        """判断PCB是否已在就绪队列中"""
+        return id(pcb) in self._in_queue
 
     def select_next_process(self, current_pcb):
-        self.ready_queue = [pcb for pcb in self.ready_queue if pcb.process.pid in self.kernel.pcbs]
-
-        if not self.ready_queue:
-            resident_pcb = self.kernel.pcbs.get(100)
-            if resident_pcb:
-                self.add_ready_process(resident_pcb)
+        # 被抢占的当前进程回到其所在优先级队列的队尾（同级轮转）
+        alive_pids = self.alive_pids
+        if current_pcb and current_pcb.process.pid in alive_pids:
+            current_pcb.state = PState.READY
+            self._push(current_pcb)
+
+        next_pcb = self._pop()
+        if next_pcb is None:
+            # 所有队列为空：兜底调度常驻进程
+            resident_pcb = self.resident_pcb
+            if resident_pcb and resident_pcb.process.pid in alive_pids:
+                next_pcb = resident_pcb
             else:
                 return None
 
-        if current_pcb and current_pcb.process.pid in self.kernel.pcbs:
-            current_pcb.state = "ready"
-            self.ready_queue.append(current_pcb)
-
-        next_pcb = self.ready_queue.pop(0)
-        next_pcb.state = "running"
-        print(f"[调度器] 选中进程 {next_pcb.process.pid}（状态：running）")
+        next_pcb.state = PState.RUNNING
+        logger.debug("[调度器] 选中进程 %s（状态：running）", next_pcb.process.pid)
         return next_pcb
 
+# ------------------------------
+# 初始进程配置
+# ------------------------------
+LOG_PID = 100      # 常驻内核进程：系统日志（就绪队列为空时兜底调度）
+MONITOR_PID = 101  # 常驻内核进程：进程数量报告
+
+# 初始进程表：(类型, pid, 循环策略, 任务ID, 指令列表, 优先级)
+# 用户进程无循环策略与任务ID，对应位置为 None
+INITIAL_PROCS = [
+    # 1. 常驻内核进程：系统日志（pid=100）
+    ("kernel", LOG_PID, "always_loop", "sys_log", [
+        Instruction("kernel", "MOV", ["R5", 0], ["register", "immediate"]),
+        Instruction("kernel", "LOG", ["系统时间：R5"], flags=["INFO"])
+    ], 3),
+    # 2. 常驻内核进程：进程数量报告（pid=101，永久循环，定期报告）
+    ("kernel", MONITOR_PID, "always_loop", "process_count_report", [
+        # 指令1：获取当前进程数（通过内核接口）
+        Instruction("kernel", "GET_PROCESS_COUNT", ["R10"], ["register"], ["SYSCALL"]),
+        # 指令2：打印进程数
+        Instruction("kernel", "PRINT", ["当前进程总数：R10"], ["memory"], ["INFO"])
+    ], 3),  # 与日志进程同级
+    # 3. 用户进程1：测试多操作数和条件跳转（pid=1）
+    ("user", 1, None, None, [
+        # 指令1：MOV R0, 100（寄存器←立即数）
+        Instruction("user", "MOV", ["R0", 100], ["register", "immediate"]),
+        # 指令2：MOV R1, 200（寄存器←立即数）
+        Instruction("user", "MOV", ["R1", 200], ["register", "immediate"]),
+        # 指令3：ADD R2, R0, R1（R2 = R0 + R1，更新条件码）
+        Instruction("user", "ADD", ["R2", "R0", "R1"], ["register", "register", "register"], ["CC"]),
+        # 指令4：JMP 6（NZ）→ 若R2≠0则跳转到PC=6（跳过指令5）
+        Instruction("user", "JMP", [6], ["immediate"], ["NZ"]),
+        # 指令5：MOV R3, 0（若跳转则不执行）
+        Instruction("user", "MOV", ["R3", 0], ["register", "immediate"]),
+        # 指令6：MOV R3, 1（跳转目标）
+        Instruction("user", "MOV", ["R3", 1], ["register", "immediate"])
+    ], 1),
+    # 4. 用户进程2：测试除零异常（pid=2）
+    ("user", 2, None, None, [
+        # 指令1：MOV R0, 50（被除数）
+        Instruction("user", "MOV", ["R0", 50], ["register", "immediate"]),
+        # 指令2：DIV R1, R0, 0（除零！R1 = R0 / 0）
+        Instruction("user", "DIV", ["R1", "R0", 0], ["register", "register", "immediate"])
+    ], 1),
+]
+
 # ------------------------------
 # 内核（Kernel）
 # ------------------------------
@@ -50,142 +140,157 @@ class Kernel:
         self.current_pcb = None  # 当前运行的进程PCB
         self.scheduler = Scheduler(self)
         self.pcbs = {}  # 所有进程的PCB：{pid: PCB}
-        self.memory = {}  # 模拟内存：{地址: 值}
-        # 系统调用表：{调用名称: 处理函数}（核心新增）
+        self._user_pcb_count = 0  # PCB表中用户进程数（创建/终止时维护，避免每次统计遍历）
+        self._log_process = None  # 常驻内核进程的直接引用（时钟ISR唤醒用，不经PCB表查找）
+        self._monitor_process = None
+        self._monitor_pcb = None
+        # 周期倒计数器：距下一次日志唤醒/监控唤醒/调度的剩余滴答数
+        self._log_c = 5
+        self._mon_c = 10
+        self._sched_c = 3
+        self.memory = array.array("q", bytes(8 * MEM_SIZE))  # 模拟内存：按地址下标存取
+        self.cpu.attach_memory(self.memory)
+        self._tick_event = Event()  # 调度循环唤醒事件：时钟中断切换/恢复进程后置位
+        self.stop_event = Event()  # 关机信号：置位后调度循环立即退出
+        # 中断/异常分发表：{类型: 处理函数}（与系统调用表同构）
+        self._int_table = {
+            "clock": self._handle_clock_interrupt
+        }
+        self._exc_table = {
+            "divide_by_zero": self._handle_divide_by_zero,
+            "privilege_violation": self._handle_privilege_violation,
+            "invalid_instruction": self._handle_invalid_instruction,
+            "memory_access": self._handle_memory_access
+        }
+        # 系统调用表：{调用名称: 处理函数}
         self.syscall_table = {
-            "get_process_count": self._sys_get_process_count,
-            "print_message": self._sys_print_message
+            sys.intern("get_process_count"): self._sys_get_process_count,
+            sys.intern("print_message"): self._sys_print_message
+        }
+        # vDSO表：只读内核状态的快速系统调用，CPU在用户态直接调用，无需特权级切换
+        self.vdso = {
+            sys.intern("get_process_count"): self._vdso_get_process_count,
+            sys.intern("get_time"): self._vdso_get_time
         }
         # 用户权限表：{pid: 权限等级}（0=普通用户，1=管理员）
         self.user_privileges = {
             1: 0,   # 用户进程1：普通用户
             2: 1,   # 用户进程2：管理员
-            3: 0    # 用户进程3：普通用户（除零测试）
+            3: 0    # 用户进程3：普通用户
         }
 
     def start(self):
         """启动系统：初始化进程+启动时钟+开始调度"""
-        print("=== 系统启动（内核初始化） ===")
+        logger.info("=== 系统启动（内核初始化） ===")
+        self._pin_to_single_core()
         self._create_initial_processes()
         self.clock.start()
         self._schedule_and_run()
 
+    def stop(self):
+        """关闭系统：停止时钟并唤醒调度循环使其退出"""
+        self.stop_event.set()
+        self.clock.stop()
+        self._tick_event.set()
+
+    def _pin_to_single_core(self):
+        """将模拟器线程固定到单个CPU核心（受GIL限制本就无法并行，避免跨核迁移开销）"""
+        if hasattr(os, "sched_setaffinity"):
+            core = min(os.sched_getaffinity(0))  # 取当前允许范围内的核心，兼容容器/taskset限制
+            os.sched_setaffinity(0, {core})
+            logger.debug("[内核] 进程绑定到CPU核心 %s", core)
+
     def _create_initial_processes(self):
-        """创建初始进程（内核进程+用户进程）"""
-        # 1. 内核进程1：系统日志（常驻循环，pid=100）
-        log_process = KernelProcess(pid=100, kernel=self, loop_strategy="always_loop")
-        log_process.register_task(
-            task_id="sys_log",
-            instructions=[
-                Instruction("kernel", "MOV", ["R5", 0], ["register", "immediate"]),
-                Instruction("kernel", "PRINT", ["系统日志：时间=R5"], ["memory"])
-            ]
-        )
-        log_pcb = PCB(log_process)
-        log_pcb.priority = 3
-        self.pcbs[100] = log_pcb
-        self.scheduler.add_ready_process(log_pcb)
-        log_process.wake_up("sys_log")
-
-        # 2. 内核进程2：进程监控（常驻循环，pid=101）
-        monitor_process = KernelProcess(pid=101, kernel=self, loop_strategy="always_loop")
-        monitor_process.register_task(
-            task_id="process_monitor",
-            instructions=[
-                Instruction("kernel", "GET_PROCESS_COUNT", ["R10"], ["register"]),
-                Instruction("kernel", "PRINT", ["内核监控：总进程数=R10"], ["memory"])
-            ]
-        )
-        monitor_pcb = PCB(monitor_process)
-        monitor_pcb.priority = 3
-        self.pcbs[101] = monitor_pcb
-        self.scheduler.add_ready_process(monitor_pcb)
-        monitor_process.wake_up("process_monitor")
-
-        # 3. 用户进程1：普通用户，获取用户态进程数（pid=1）
-        user1 = UserProcess(pid=1, instructions=[
-            Instruction("user", "SYSCALL", ["get_process_count", "R0"], flags=["TRAP"]),
-            Instruction("user", "PRINT", ["普通用户：当前用户态进程数=R0"], ["memory"])
-        ])
-        user1_pcb = PCB(user1)
-        user1_pcb.priority = 1
-        self.pcbs[1] = user1_pcb
-        self.scheduler.add_ready_process(user1_pcb)
-
-        # 4. 用户进程2：管理员，获取全系统进程数（pid=2）
-        user2 = UserProcess(pid=2, instructions=[
-            Instruction("user", "SYSCALL", ["get_process_count", "R0"], flags=["TRAP"]),
-            Instruction("user", "PRINT", ["管理员：当前全系统进程数=R0"], ["memory"])
-        ])
-        user2_pcb = PCB(user2)
-        user2_pcb.priority = 1
-        self.pcbs[2] = user2_pcb
-        self.scheduler.add_ready_process(user2_pcb)
-
-        # 5. 用户进程3：除零测试（pid=3）
-        user3 = UserProcess(pid=3, instructions=[
-            Instruction("user", "MOV", ["R0", 10], ["register", "immediate"]),
-            Instruction("user", "DIV", ["R1", "R0", 0], ["register", "register", "immediate"])
-        ])
-        user3_pcb = PCB(user3)
-        user3_pcb.priority = 1
-        self.pcbs[3] = user3_pcb
-        self.scheduler.add_ready_process(user3_pcb)
-        print(f"\n初始化后就绪队列进程ID：{[pcb.process.pid for pcb in self.scheduler.ready_queue]}")
-        print(f"初始化后PCB表进程ID：{list(self.pcbs.keys())}")
+        """按 INITIAL_PROCS 创建初始进程（内核进程+用户进程）"""
+        for kind, pid, strategy, task_id, instructions, priority in INITIAL_PROCS:
+            if kind == "kernel":
+                process = KernelProcess(pid=pid, kernel=self, loop_strategy=strategy)
+                process.register_task(task_id=task_id, instructions=instructions)
+            else:
+                process = UserProcess(pid=pid, instructions=instructions)
+                self._user_pcb_count += 1
+            pcb = PCB(process)
+            pcb.priority = priority
+            self.pcbs[pid] = pcb
+            self.scheduler.add_ready_process(pcb)
+            if task_id is not None:
+                process.wake_up(task_id)  # 初始唤醒常驻内核进程
+
+        log_pcb = self.pcbs[LOG_PID]
+        self._log_process = log_pcb.process
+        self.scheduler.resident_pcb = log_pcb
+        self._monitor_pcb = self.pcbs[MONITOR_PID]
+        self._monitor_process = self._monitor_pcb.process
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("\n初始化后就绪队列进程ID：%s", [pcb.process.pid for level, queue in sorted(self.scheduler.queues.items()) for pcb in queue])
+            logger.debug("初始化后PCB表进程ID：%s", list(self.pcbs))
 
     def handle_interrupt(self, interrupt_type, data, current_context):
         """处理硬件中断（如时钟中断）"""
-        if interrupt_type == "clock":
-            self._handle_clock_interrupt(data, current_context)
+        handler = self._int_table.get(interrupt_type)
+        if handler:
+            handler(data, current_context)
 
     def _handle_clock_interrupt(self, ticks, current_context):
-        """时钟中断处理：更新时间+触发调度"""
+        """时钟中断处理：更新时间+唤醒常驻进程+触发调度"""
+        # 一次中断可能合并多个滴答：倒计数器按经过的滴答数递减，减到0及以下即跨过周期边界
+        elapsed = ticks - self.system_time
         self.system_time = ticks
-        print(f"\n[内核ISR] 处理时钟中断，系统时间={self.system_time}")
-
-        # 每5个滴答唤醒系统日志进程
-        if ticks % 5 == 0:
-            log_process = self.pcbs.get(100).process
-            log_process.wake_up("sys_log")
-
-        # 每10个滴答唤醒进程监控进程
-        if ticks % 10 == 0:
-            monitor_process = self.pcbs.get(101).process
-            monitor_process.wake_up("process_monitor")
+        logger.debug("\n[内核ISR] 处理时钟中断，系统时间=%s", self.system_time)
+
+        # 每5个滴答唤醒日志进程
+        self._log_c -= elapsed
+        if self._log_c <= 0:
+            self._log_c = self._log_c % 5 or 5
+            self._log_process.wake_up("sys_log")
+
+        # 每10个滴答唤醒进程数量报告进程
+        self._mon_c -= elapsed
+        if self._mon_c <= 0:
+            self._mon_c = self._mon_c % 10 or 10
+            monitor_pcb = self._monitor_pcb
+            scheduler = self.scheduler
+            # 监控进程已终止则不再唤醒/重新入队（直接引用不随PCB表删除而失效）
+            if monitor_pcb and monitor_pcb.process.pid in scheduler.alive_pids:
+                self._monitor_process.wake_up("process_count_report")
+                # 确保进程在就绪队列中
+                if not scheduler.is_queued(monitor_pcb) and monitor_pcb.state != PState.RUNNING:
+                    scheduler.add_ready_process(monitor_pcb)
+            logger.debug("[内核] 触发进程数量统计（系统时间=%s）", ticks)
 
         # 保存当前进程上下文
-        if self.current_pcb:
-            self.current_pcb.context = current_context
-            self.current_pcb.time_slice += 1
-            print(f"[内核] 保存进程{self.current_pcb.process.pid}上下文（时间片={self.current_pcb.time_slice}）")
+        pcb = self.current_pcb
+        if pcb:
+            pcb.context = current_context
+            pcb.time_slice += elapsed
+            logger.debug("[内核] 保存进程 %s 上下文（时间片=%s）", pcb.process.pid, pcb.time_slice)
 
         # 每3个滴答触发调度（时间片轮转）
-        if ticks % 3 == 0:
-            print(f"[内核] 时间片用完，触发调度")
-            self.current_pcb = self.scheduler.select_next_process(self.current_pcb)
-            if self.current_pcb:
-                self.cpu.load_context(self.current_pcb.context)
+        self._sched_c -= elapsed
+        if self._sched_c <= 0:
+            self._sched_c = self._sched_c % 3 or 3
+            logger.debug("[内核] 时间片用完，触发调度")
+            pcb = self.current_pcb = self.scheduler.select_next_process(pcb)
+            if pcb:
+                self.cpu.load_context(pcb.context)
             else:
                 return
-        else:
-            if self.current_pcb:
-                self.cpu.load_context(current_context)
+        elif pcb:
+            # 未切换进程：CPU现场仍是当前进程的，无需从帧恢复寄存器
+            self.cpu.resume_context(current_context)
 
-        if self.current_pcb:
+        if pcb:
             self._resume_current_process()
+            self._tick_event.set()  # 唤醒调度循环，立即执行恢复的进程
 
     def handle_exception(self, exception_type, data, current_context):
         """处理内中断（异常）"""
-        if exception_type == "divide_by_zero":
-            self._handle_divide_by_zero(data, current_context)
-        elif exception_type == "privilege_violation":
-            self._handle_privilege_violation(data, current_context)
-        elif exception_type == "invalid_instruction":
-            self._handle_invalid_instruction(data, current_context)
+        handler = self._exc_table.get(exception_type)
+        if handler:
+            handler(data, current_context)
 
-    def _handle_divide_by_zero(self, instr, current_context):
-        print(f"[内核异常] 除零错误：指令{instr}触发，终止进程")
+    def _fault_terminate_and_reschedule(self, current_context):
+        """异常公共处理：保存上下文→终止当前进程→调度并恢复下一个进程"""
         if self.current_pcb:
             self.current_pcb.context = current_context
             self._terminate_process(self.current_pcb)
@@ -195,338 +300,135 @@ class Kernel:
             self.cpu.load_context(self.current_pcb.context)
             self._resume_current_process()
 
+    def _handle_divide_by_zero(self, instr, current_context):
+        logger.warning("[内核异常] 除零错误！指令 %s 触发内中断，进程将被终止", instr)
+        self._fault_terminate_and_reschedule(current_context)
+
     def _handle_privilege_violation(self, instr, current_context):
-        print(f"[内核异常] 特权违规：用户态执行{instr}，终止进程")
-        if self.current_pcb:
-            self.current_pcb.context = current_context
-            self._terminate_process(self.current_pcb)
-            self.current_pcb = None
-        self.current_pcb = self.scheduler.select_next_process(None)
-        if self.current_pcb:
-            self.cpu.load_context(self.current_pcb.context)
-            self._resume_current_process()
+        logger.warning("[内核异常] 特权违规！用户态执行指令 %s，进程将被终止", instr)
+        self._fault_terminate_and_reschedule(current_context)
 
     def _handle_invalid_instruction(self, instr, current_context):
-        print(f"[内核异常] 无效指令：{instr}，终止进程")
-        if self.current_pcb:
-            self.current_pcb.context = current_context
-            self._terminate_process(self.current_pcb)
-            self.current_pcb = None
-        self.current_pcb = self.scheduler.select_next_process(None)
-        if self.current_pcb:
-            self.cpu.load_context(self.current_pcb.context)
-            self._resume_current_process()
+        logger.warning("[内核异常] 无效指令！%s，进程将被终止", instr)
+        self._fault_terminate_and_reschedule(current_context)
+
+    def _handle_memory_access(self, instr, current_context):
+        logger.warning("[内核异常] 非法内存访问！%s，进程将被终止", instr)
+        self._fault_terminate_and_reschedule(current_context)
 
     # ------------------------------
-    # 系统调用核心处理逻辑（新增）
+    # 系统调用核心处理逻辑
     # ------------------------------
     def handle_syscall(self, syscall_name, user_context):
         """系统调用统一入口：分发到对应处理函数"""
         if syscall_name not in self.syscall_table:
-            print(f"[内核] 未知系统调用：{syscall_name}")
+            logger.debug("[内核] 未知系统调用：%s", syscall_name)
             return -1  # 错误码
         # 调用对应处理函数
         return self.syscall_table[syscall_name](user_context)
 
     def _sys_get_process_count(self, user_context):
         """系统调用：获取进程数（根据用户权限返回不同结果）"""
-        # 1. 查找发起系统调用的用户进程PID
-        current_pid = None
-        for pid, pcb in self.pcbs.items():
-            if isinstance(pcb.process, UserProcess) and pcb.context["pc"] == user_context["pc"]:
-                current_pid = pid
-                break
-        if not current_pid:
+        # 1. 同步系统调用：发起者即当前运行进程
+        current_pid = self.current_pcb.process.pid if self.current_pcb else None
+        if current_pid is None:
             return -1  # 无法识别进程
 
         # 2. 根据权限返回结果
+        return self._count_processes_for(current_pid)
+
+    def _count_processes_for(self, current_pid):
+        """按调用进程的权限统计进程数（普通用户仅用户态进程，管理员全系统）"""
         privilege = self.user_privileges.get(current_pid, 0)
         if privilege == 0:
             # 普通用户：仅统计用户态进程
-            user_count = len([
-                pcb for pcb in self.pcbs.values()
-                if isinstance(pcb.process, UserProcess)
-            ])
-            print(f"[内核] 处理系统调用：{current_pid}（普通用户）→ 用户态进程数={user_count}")
+            user_count = self._user_pcb_count
+            logger.debug("[内核] 处理系统调用：%s（普通用户）→ 用户态进程数=%s", current_pid, user_count)
             return user_count
         else:
             # 管理员：统计全系统进程（用户+内核）
             total_count = len(self.pcbs)
-            print(f"[内核] 处理系统调用：{current_pid}（管理员）→ 全系统进程数={total_count}")
+            logger.debug("[内核] 处理系统调用：%s（管理员）→ 全系统进程数=%s", current_pid, total_count)
             return total_count
 
     def _sys_print_message(self, user_context):
         """系统调用：打印消息（示例）"""
-        msg = user_context["registers"].get("R1", "空消息")
-        print(f"[内核] 处理系统调用print_message → {msg}")
+        msg = user_context.registers[REG_INDEX["R1"]]
+        logger.debug("[内核] 处理系统调用print_message → %s", msg)
         return 0  # 成功码
 
+    # ------------------------------
+    # vDSO快速路径（不修改内核状态，不切换特权级）
+    # ------------------------------
+    def _vdso_get_process_count(self):
+        """vDSO：获取进程数（调用者即当前运行进程）"""
+        if not self.current_pcb:
+            return -1  # 无法识别进程
+        return self._count_processes_for(self.current_pcb.process.pid)
+
+    def _vdso_get_time(self):
+        """vDSO：获取系统时间（时钟滴答数）"""
+        return self.system_time
+
     # ------------------------------
     # 进程终止与回收
     # ------------------------------
     def _terminate_process(self, pcb):
         pid = pcb.process.pid
-        process_type = "内核进程" if isinstance(pcb.process, KernelProcess) else "用户进程"
-        print(f"\n[进程终止] {process_type}{pid} 开始回收资源...")
+        logger.debug("\n[进程终止] %s %s 开始回收资源...", pcb.process.type_name, pid)
 
         # 1. 从PCB表删除
         if pid in self.pcbs:
             del self.pcbs[pid]
-            print(f"[资源回收] 已删除进程{pid}的PCB")
+            if isinstance(pcb.process, UserProcess):
+                self._user_pcb_count -= 1
+            logger.debug("[资源回收] 已删除进程 %s 的PCB", pid)
 
-        # 2. 从就绪队列移除
-        self.scheduler.ready_queue = [q for q in self.scheduler.ready_queue if q.process.pid != pid]
-        print(f"[资源回收] 已从就绪队列移除进程{pid}")
+        # 2. 就绪队列条目无需重建：移出存活集合，调度器出队时惰性丢弃
+        pcb.state = PState.TERMINATED
+        self.scheduler.alive_pids.discard(pid)
+        logger.debug("[资源回收] 进程 %s 的就绪队列条目将在出队时丢弃", pid)
 
         # 3. 模拟内存回收
-        print(f"[资源回收] 进程{pid}回收完成\n")
+        logger.debug("[资源回收] 进程 %s 回收完成\n", pid)
 
     # ------------------------------
     # 调度与执行主循环
     # ------------------------------
     def _schedule_and_run(self):
         """调度进程并执行指令"""
-        while True:
-            if not self.clock.running:
-                break
-            if self.current_pcb:
+        # 循环内反复使用的对象先绑定为局部变量（current_pcb 会被时钟ISR改写，每轮重新读取）
+        cpu = self.cpu
+        scheduler = self.scheduler
+        is_stopped = self.stop_event.is_set
+        tick_wait = self._tick_event.wait
+        tick_clear = self._tick_event.clear
+        while not is_stopped():
+            pcb = self.current_pcb
+            if pcb:
                 # 获取当前进程的下一条指令
-                process = self.current_pcb.process
-                if isinstance(process, KernelProcess):
-                    instr = process.get_next_instruction()
-                else:
-                    instr = process.get_next_instruction(self.cpu.pc)
+                process = pcb.process
+                instr = process.get_next_instruction(cpu.pc)
 
                 if instr:
                     # 执行指令
-                    self.cpu.execute_instruction(instr)
+                    cpu.execute_instruction(instr)
                 else:
                     # 指令执行完毕，终止进程
-                    print(f"[进程状态] 进程{process.pid}指令执行完毕")
-                    self._terminate_process(self.current_pcb)
-                    self.current_pcb = self.scheduler.select_next_process(None)
-                    if self.current_pcb:
-                        self.cpu.load_context(self.current_pcb.context)
+                    logger.debug("[进程状态] 进程 %s 指令执行完毕", process.pid)
+                    self._terminate_process(pcb)
+                    pcb = self.current_pcb = scheduler.select_next_process(None)
+                    if pcb:
+                        cpu.load_context(pcb.context)
             else:
                 # 无当前进程，调度新进程
-                self.current_pcb = self.scheduler.select_next_process(None)
-                if self.current_pcb:
-                    self.cpu.load_context(self.current_pcb.context)
-            # 模拟指令执行耗时
-            Event().wait(0.5)
+                pcb = self.current_pcb = scheduler.select_next_process(None)
+                if pcb:
+                    cpu.load_context(pcb.context)
+            # 模拟指令执行耗时（期间若有中断恢复进程则立即唤醒）
+            tick_wait(0.5)
+            tick_clear()
 
     def _resume_current_process(self):
         """恢复进程执行"""
-        print(f"[内核] 恢复进程{self.current_pcb.process.pid}执行")
-    def __init__(self):
-        self.cpu = CPU(self)
-        self.clock = ClockDevice(interval=1)
-        self.clock.set_cpu(self.cpu)
-        self.system_time = 0
-        self.current_pcb = None
-        self.scheduler = Scheduler(self)
-        self.pcbs = {}
-        self.memory = {}  # 模拟内存（地址→值），用于内存寻址
-
-    def start(self):
-        print("=== 系统启动（内核初始化） ===")
-        self._create_initial_processes()
-        self.clock.start()
-        self._schedule_and_run()
-
-    def _create_initial_processes(self):
-        # 1. 常驻内核进程：系统日志（pid=100）
-        log_process = KernelProcess(pid=100, kernel=self, loop_strategy="always_loop")
-        log_process.register_task(
-            task_id="sys_log",
-            instructions=[
-                Instruction("kernel", "MOV", ["R5", self.system_time], ["register", "immediate"]),
-                Instruction("kernel", "LOG", ["系统时间：R5"], flags=["INFO"])
-            ]
-        )
-        log_pcb = PCB(log_process)
-        log_pcb.priority = 3
-        self.pcbs[log_process.pid] = log_pcb
-        self.scheduler.add_ready_process(log_pcb)
-        log_process.wake_up("sys_log")
-
-        # 新增：进程数量报告内核进程（pid=101，常驻循环）
-        process_monitor = KernelProcess(
-            pid=101,
-            kernel=self,
-            loop_strategy="always_loop"  # 永久循环，定期报告
-        )
-        # 注册“进程数量报告”任务（指令会动态获取进程数）
-        process_monitor.register_task(
-            task_id="process_count_report",
-            instructions=[
-                # 指令1：获取当前进程数（通过内核接口）
-                Instruction("kernel", "GET_PROCESS_COUNT", ["R10"], ["register"], ["SYSCALL"]),
-                # 指令2：打印进程数
-                Instruction("kernel", "PRINT", ["当前进程总数：R10"], ["memory"], ["INFO"])
-            ]
-        )
-        # 创建PCB并设置高优先级
-        monitor_pcb = PCB(process_monitor)
-        monitor_pcb.priority = 3  # 与日志进程同级
-        self.pcbs[process_monitor.pid] = monitor_pcb
-        self.scheduler.add_ready_process(monitor_pcb)
-        # 初始唤醒，开始报告
-        process_monitor.wake_up("process_count_report")
-
-        # 2. 用户进程1：测试多操作数和条件跳转（pid=1）
-        user1 = UserProcess(pid=1, instructions=[
-            # 指令1：MOV R0, 100（寄存器←立即数）
-            Instruction("user", "MOV", ["R0", 100], ["register", "immediate"]),
-            # 指令2：MOV R1, 200（寄存器←立即数）
-            Instruction("user", "MOV", ["R1", 200], ["register", "immediate"]),
-            # 指令3：ADD R2, R0, R1（R2 = R0 + R1，更新条件码）
-            Instruction("user", "ADD", ["R2", "R0", "R1"], ["register", "register", "register"], ["CC"]),
-            # 指令4：JMP 6（NZ）→ 若R2≠0则跳转到PC=6（跳过指令5）
-            Instruction("user", "JMP", [6], ["immediate"], ["NZ"]),
-            # 指令5：MOV R3, 0（若跳转则不执行）
-            Instruction("user", "MOV", ["R3", 0], ["register", "immediate"]),
-            # 指令6：MOV R3, 1（跳转目标）
-            Instruction("user", "MOV", ["R3", 1], ["register", "immediate"])
-        ])
-        user1_pcb = PCB(user1)
-        user1_pcb.priority = 1
-        self.pcbs[user1.pid] = user1_pcb
-        self.scheduler.add_ready_process(user1_pcb)
-
-        # 3. 用户进程2：测试除零异常（pid=2）
-        user2 = UserProcess(pid=2, instructions=[
-            # 指令1：MOV R0, 50（被除数）
-            Instruction("user", "MOV", ["R0", 50], ["register", "immediate"]),
-            # 指令2：DIV R1, R0, 0（除零！R1 = R0 / 0）
-            Instruction("user", "DIV", ["R1", "R0", 0], ["register", "register", "immediate"])
-        ])
-        user2_pcb = PCB(user2)
-        user2_pcb.priority = 1
-        self.pcbs[user2.pid] = user2_pcb
-        self.scheduler.add_ready_process(user2_pcb)
-
-    def handle_interrupt(self, interrupt_type, data, current_context):
-        if interrupt_type == "clock":
-            self._handle_clock_interrupt(data, current_context)
-
-    def _handle_clock_interrupt(self, ticks, current_context):
-        self.system_time = ticks
-        print(f"\n[内核ISR] 处理时钟中断，系统时间={self.system_time}")
-
-        # 每5个滴答唤醒日志进程（原有逻辑）
-        if ticks % 5 == 0:
-            log_process = self.pcbs.get(100).process
-            log_process.wake_up("sys_log")
-
-        # 新增：每10个滴答唤醒进程数量报告进程
-        if ticks % 10 == 0:
-            monitor_process = self.pcbs.get(101).process
-            if monitor_process:
-                monitor_process.wake_up("process_count_report")
-                # 确保进程在就绪队列中
-                monitor_pcb = self.pcbs[101]
-                if monitor_pcb not in self.scheduler.ready_queue and monitor_pcb.state != "running":
-                    self.scheduler.add_ready_process(monitor_pcb)
-            print(f"[内核] 触发进程数量统计（系统时间={ticks}）")
-
-        if self.current_pcb:
-            self.current_pcb.context = current_context
-            self.current_pcb.time_slice += 1
-            print(f"[内核] 保存进程 {self.current_pcb.process.pid} 上下文（时间片={self.current_pcb.time_slice}）")
-
-        if ticks % 3 == 0:
-            print(f"[内核] 时间片用完，触发调度")
-            self.current_pcb = self.scheduler.select_next_process(self.current_pcb)
-            if self.current_pcb:
-                self.cpu.load_context(self.current_pcb.context)
-            else:
-                return
-        else:
-            if self.current_pcb:
-                self.cpu.load_context(current_context)
-
-        if self.current_pcb:
-            self._resume_current_process()
-
-    def handle_exception(self, exception_type, data, current_context):
-        if exception_type == "divide_by_zero":
-            self._handle_divide_by_zero(data, current_context)
-        elif exception_type == "privilege_violation":
-            self._handle_privilege_violation(data, current_context)
-        elif exception_type == "invalid_instruction":
-            self._handle_invalid_instruction(data, current_context)
-
-    def _handle_divide_by_zero(self, instr, current_context):
-        print(f"[内核异常] 除零错误！指令 {instr} 触发内中断，进程将被终止")
-        if self.current_pcb:
-            self.current_pcb.context = current_context
-            self._terminate_process(self.current_pcb)
-            self.current_pcb = None
-        self.current_pcb = self.scheduler.select_next_process(None)
-        if self.current_pcb:
-            self.cpu.load_context(self.current_pcb.context)
-            self._resume_current_process()
-
-    def _handle_privilege_violation(self, instr, current_context):
-        print(f"[内核异常] 特权违规！用户态执行指令 {instr}，进程将被终止")
-        if self.current_pcb:
-            self.current_pcb.context = current_context
-            self._terminate_process(self.current_pcb)
-            self.current_pcb = None
-        self.current_pcb = self.scheduler.select_next_process(None)
-        if self.current_pcb:
-            self.cpu.load_context(self.current_pcb.context)
-            self._resume_current_process()
-
-    def _handle_invalid_instruction(self, instr, current_context):
-        print(f"[内核异常] 无效指令！{instr}，进程将被终止")
-        if self.current_pcb:
-            self.current_pcb.context = current_context
-            self._terminate_process(self.current_pcb)
-            self.current_pcb = None
-        self.current_pcb = self.scheduler.select_next_process(None)
-        if self.current_pcb:
-            self.cpu.load_context(self.current_pcb.context)
-            self._resume_current_process()
-
-    def _terminate_process(self, pcb):
-        pid = pcb.process.pid
-        process_type = "内核进程" if isinstance(pcb.process, KernelProcess) else "用户进程"
-        print(f"\n[进程终止] {process_type} {pid} 开始回收资源...")
-
-        if pid in self.pcbs:
-            del self.pcbs[pid]
-            print(f"[资源回收] 已删除进程 {pid} 的PCB")
-
-        self.scheduler.ready_queue = [q for q in self.scheduler.ready_queue if q.process.pid != pid]
-        print(f"[资源回收] 已从就绪队列移除进程 {pid}")
-        print(f"[资源回收] 进程 {pid} 回收完成\n")
-
-    def _schedule_and_run(self):
-        while True:
-            if not self.clock.running:
-                break
-            if self.current_pcb:
-                process = self.current_pcb.process
-                if isinstance(process, KernelProcess):
-                    instr = process.get_next_instruction()
-                else:
-                    instr = process.get_next_instruction(self.cpu.pc)
-
-                if instr:
-                    self.cpu.execute_instruction(instr)
-                else:
-                    print(f"[进程状态] 进程 {process.pid} 指令执行完毕")
-                    self._terminate_process(self.current_pcb)
-                    self.current_pcb = self.scheduler.select_next_process(None)
-                    if self.current_pcb:
-                        self.cpu.load_context(self.current_pcb.context)
-            else:
-                self.current_pcb = self.scheduler.select_next_process(None)
-                if self.current_pcb:
-                    self.cpu.load_context(self.current_pcb.context)
-            Event().wait(0.5)
-
-    def _resume_current_process(self):
-        print(f"[内核] 恢复进程 {self.current_pcb.process.pid} 执行")
+        logger.debug("[内核] 恢复进程 %s 执行", self.current_pcb.process.pid)
@@ -1,20 +1,56 @@
+import array
+import logging
+import struct
+
+logger = logging.getLogger(__name__)
+
+# 虚拟页权限位（页表权限数组中存储位掩码，对外接口仍使用权限字符串）
+PERM_READ = 1   # bit 0：可读
+PERM_WRITE = 2  # bit 1：可写
+PERM_EXEC = 4   # bit 2：可执行
+PERM_CODES = {"r": PERM_READ, "rw": PERM_READ | PERM_WRITE, "rx": PERM_READ | PERM_EXEC}
+PERM_NAMES = {code: name for name, code in PERM_CODES.items()}
+PERM_NAMES[0] = "none"  # 无权限位（权限数组初始值）
+
+_U32 = struct.Struct("<I")  # 4字节小端无符号整数（32位系统字长的读写快速路径）
+
+TLB_SIZE = 64  # 软件TLB表项数（直接映射，必须为2的幂）
+TLB_EMPTY = (None, -1, 0)  # 空表项：(标签, 物理页号, 权限位)，标签 None 不与任何地址匹配
+
+
 class Memory:
-    def __init__(self, total_physical_pages=64, page_size=4096):
+    def __init__(self, total_physical_pages=64, page_size=4096, max_pids=64, max_vpn=256):
         """
         初始化内存模块（贴合现代 OS 内存模型）
         :param total_physical_pages: 物理页框总数（模拟物理内存大小：64页 × 4KB = 256KB）
         :param page_size: 页大小（现代 OS 常见值：4096字节=4KB）
+        :param max_pids: 可同时拥有虚拟地址空间的进程数上限（页表槽位数）
+        :param max_vpn: 每个进程的虚拟页数（虚拟地址空间 = max_vpn × 页大小）
         """
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise ValueError(f"页大小必须为2的幂：{page_size}")
         self.page_size = page_size  # 页大小（虚拟/物理页统一大小）
+        self.page_shift = page_size.bit_length() - 1  # 页号 = 地址 >> page_shift
+        self.page_mask = page_size - 1  # 页内偏移 = 地址 & page_mask
         self.total_physical_pages = total_physical_pages  # 物理页框总数
+        self.max_pids = max_pids
+        self.max_vpn = max_vpn
 
-        # 1. 物理内存管理：模拟物理页框（页框号→页数据）+ 空闲页框链表
-        self.physical_pages = {}  # 物理页框：{page_frame_num: 页数据（bytes）}
-        self.free_page_frames = list(range(total_physical_pages))  # 空闲页框链表（初始所有页空闲）
+        # 1. 物理内存管理：连续的物理内存（页框 pfn 占 [pfn*页大小, (pfn+1)*页大小)）+ 空闲页框位图
+        self.ram = bytearray(total_physical_pages * page_size)  # 物理内存：按物理地址直接读写
+        self._ram_view = memoryview(self.ram)  # 物理内存视图：切片不复制数据（ram 因此不可改变长度）
+        self._zero_page = bytes(page_size)  # 全零页模板：释放页框时用于擦除，避免每次重新分配
+        self.free_bits = bytearray(b"\x01") * total_physical_pages  # 空闲页框位图：1=空闲，0=已分配
+        self.free_count = total_physical_pages  # 空闲页框数
+        self.next_free = 0  # 扫描起点提示：不大于最小的空闲页框号
 
-        # 2. 进程虚拟地址空间管理：为每个进程维护“虚拟页→物理页”映射表+权限
-        # 结构：{pid: {"page_table": {vpn: pfn}, "permissions": {vpn: "r"/"rw"/"rx"}}}
-        self.process_vm = {}
+        # 2. 进程虚拟地址空间管理：所有进程共用一张扁平页表，按 (槽位, 虚拟页号) 定位表项
+        # 表项下标 = slot * max_vpn + vpn；page_table 存物理页号（-1 表示未映射），perms 存权限位（0 表示无权限）
+        self.page_table = array.array("i", [-1]) * (max_pids * max_vpn)
+        self.perms = array.array("B", bytes(max_pids * max_vpn))
+        self.pid_slots = {}  # 进程页表槽位：{pid: slot}
+        # 软件TLB：直接映射，按 (pid, vpn) 散列到表项，命中时跳过页表查找
+        self._tlb = [TLB_EMPTY] * TLB_SIZE
 
         # 3. 内核专用内存：模拟内核固定地址空间（如内核代码段、PCB 存储区）
         self.kernel_reserved_pages = self._reserve_kernel_memory()
@@ -24,22 +60,33 @@ class Memory:
         kernel_pages = []
         # 预留前 4 个页框给内核（模拟内核代码、全局变量、中断向量表）
         for i in range(4):
-            if self.free_page_frames:
-                pfn = self.free_page_frames.pop(0)
+            pfn = self._take_free_frame()
+            if pfn is not None:
                 kernel_pages.append(pfn)
                 # 初始化内核页数据（标记为内核专用）
-                self.physical_pages[pfn] = b"KERNEL_RESERVED" + b"\x00" * (self.page_size - 16)
-        print(f"[内存模块] 预留内核专用页框：{kernel_pages}（共{len(kernel_pages)}页）")
-        return kernel_pages
+                base = pfn << self.page_shift
+                self.ram[base:base + 15] = b"KERNEL_RESERVED"
+        logger.debug("[内存模块] 预留内核专用页框：%s（共%s页）", kernel_pages, len(kernel_pages))
+        return frozenset(kernel_pages)  # 只读集合：释放页框时 O(1) 判断是否为内核页
+
+    def _take_free_frame(self):
+        """从位图中取出最小的空闲页框号（从扫描提示处开始查找），无空闲页框返回 None"""
+        pfn = self.free_bits.find(1, self.next_free)
+        if pfn < 0:
+            return None
+        self.free_bits[pfn] = 0
+        self.free_count -= 1
+        self.next_free = pfn + 1
+        return pfn
 
     def create_process_vm(self, pid):
         """为新进程创建独立虚拟地址空间（现代 OS 进程地址空间隔离的核心）"""
-        if pid not in self.process_vm:
-            self.process_vm[pid] = {
-                "page_table": {},  # 虚拟页号（vpn）→ 物理页号（pfn）映射
-                "permissions": {}  # 虚拟页权限：r（只读）、rw（读写）、rx（读执行）
-            }
-        print(f"[内存模块] 为进程{pid}创建虚拟地址空间（初始空页表）")
+        if pid not in self.pid_slots:
+            if len(self.pid_slots) >= self.max_pids:
+                logger.warning("[内存模块] 页表槽位已满，进程%s创建虚拟地址空间失败", pid)
+                return
+            self.pid_slots[pid] = len(self.pid_slots)
+        logger.debug("[内存模块] 为进程%s创建虚拟地址空间（初始空页表）", pid)
 
     def allocate_physical_page(self, pid, vpn, permission="rw"):
         """
@@ -49,47 +96,60 @@ class Memory:
         :param permission: 虚拟页权限
         :return: 分配的物理页号（pfn），失败返回 None
         """
-        # 1. 检查进程虚拟地址空间是否存在
-        if pid not in self.process_vm:
-            print(f"[内存模块] 进程{pid}未创建虚拟地址空间，分配失败")
+        # 1. 检查进程虚拟地址空间是否存在、虚拟页号是否越界
+        slot = self.pid_slots.get(pid)
+        if slot is None:
+            logger.debug("[内存模块] 进程%s未创建虚拟地址空间，分配失败", pid)
             return None
-
-        # 2. 检查空闲页框
-        if not self.free_page_frames:
-            print(f"[内存模块] 物理内存耗尽，进程{pid}页分配失败")
+        if not 0 <= vpn < self.max_vpn:
+            logger.debug("[内存模块] 进程%s虚拟页%s超出虚拟地址空间，分配失败", pid, vpn)
+            return None
+        # 先解析权限：未知权限在占用页框、改动页表之前即失败
+        perm_code = PERM_CODES.get(permission)
+        if perm_code is None:
+            logger.debug("[内存模块] 进程%s虚拟页%s权限%s无效，分配失败", pid, vpn, permission)
             return None
 
-        # 3. 分配物理页框
-        pfn = self.free_page_frames.pop(0)
-        # 初始化页数据（空数据）
-        self.physical_pages[pfn] = b"\x00" * self.page_size
+        # 2. 分配空闲物理页框（空闲页框的数据在释放时已清零，无需初始化）
+        pfn = self._take_free_frame()
+        if pfn is None:
+            logger.warning("[内存模块] 物理内存耗尽，进程%s页分配失败", pid)
+            return None
 
-        # 4. 建立虚拟页→物理页映射 + 设置权限
-        self.process_vm[pid]["page_table"][vpn] = pfn
-        self.process_vm[pid]["permissions"][vpn] = permission
+        # 3. 建立虚拟页→物理页映射 + 设置权限
+        index = slot * self.max_vpn + vpn
+        self.page_table[index] = pfn
+        self.perms[index] = perm_code
+        self._tlb_invalidate(pid, vpn)  # 覆盖已有映射时，旧的TLB表项失效
 
-        print(f"[内存模块] 进程{pid}：虚拟页{vpn} → 物理页{pfn}（权限：{permission}），剩余空闲页{len(self.free_page_frames)}")
+        logger.debug("[内存模块] 进程%s：虚拟页%s → 物理页%s（权限：%s），剩余空闲页%s", pid, vpn, pfn, permission, self.free_count)
         return pfn
 
     def free_physical_page(self, pid, vpn):
         """释放进程的物理页框并删除虚拟地址映射（模拟进程退出时的内存回收）"""
-        if pid not in self.process_vm:
+        slot = self.pid_slots.get(pid)
+        if slot is None or not 0 <= vpn < self.max_vpn:
             return
-        page_table = self.process_vm[pid]["page_table"]
-        if vpn not in page_table:
+        index = slot * self.max_vpn + vpn
+        pfn = self.page_table[index]
+        if pfn < 0:
             return
 
-        # 1. 回收物理页框到空闲链表
-        pfn = page_table.pop(vpn)
+        # 1. 删除映射（权限位随表项一起失效）并击落对应TLB表项
+        self.page_table[index] = -1
+        self.perms[index] = 0
+        self._tlb_invalidate(pid, vpn)
+
+        # 2. 回收物理页框到空闲链表
         if pfn not in self.kernel_reserved_pages:  # 不允许释放内核页
-            self.free_page_frames.append(pfn)
+            self.free_bits[pfn] = 1
+            self.free_count += 1
+            if pfn < self.next_free:
+                self.next_free = pfn  # 回退扫描提示，优先复用低地址页框
             # 清空页数据（模拟内存擦除）
-            del self.physical_pages[pfn]
-            print(f"[内存模块] 进程{pid}：释放虚拟页{vpn}→物理页{pfn}，剩余空闲页{len(self.free_page_frames)}")
-
-        # 2. 删除权限记录
-        if vpn in self.process_vm[pid]["permissions"]:
-            del self.process_vm[pid]["permissions"][vpn]
+            base = pfn << self.page_shift
+            self.ram[base:base + self.page_size] = self._zero_page
+            logger.debug("[内存模块] 进程%s：释放虚拟页%s→物理页%s，剩余空闲页%s", pid, vpn, pfn, self.free_count)
 
     def translate_virtual_address(self, pid, virtual_addr):
         """
@@ -98,29 +158,87 @@ class Memory:
         :param virtual_addr: 虚拟地址（整数）
         :return: (物理地址, 权限)，转换失败返回 (None, None)
         """
-        # 1. 检查进程虚拟地址空间
-        if pid not in self.process_vm:
-            print(f"[内存模块] 进程{pid}无虚拟地址空间，地址转换失败")
+        physical_addr, perm_code = self._translate(pid, virtual_addr)
+        if physical_addr is None:
             return None, None
+        return physical_addr, PERM_NAMES[perm_code]
 
-        # 2. 拆分虚拟地址为“虚拟页号（vpn）”和“页内偏移（offset）”
-        vpn = virtual_addr // self.page_size  # 虚拟页号 = 虚拟地址 // 页大小
-        offset = virtual_addr % self.page_size  # 页内偏移 = 虚拟地址 % 页大小
+    def _translate(self, pid, virtual_addr):
+        """地址转换核心：返回 (物理地址, 权限位)，转换失败返回 (None, 0)"""
+        # 1. 拆分虚拟地址为“虚拟页号（vpn）”和“页内偏移（offset）”
+        vpn = virtual_addr >> self.page_shift  # 虚拟页号 = 虚拟地址 // 页大小
+        offset = virtual_addr & self.page_mask  # 页内偏移 = 虚拟地址 % 页大小
 
-        # 3. 查页表获取物理页号（pfn）
-        page_table = self.process_vm[pid]["page_table"]
-        if vpn not in page_table:
-            print(f"[内存模块] 进程{pid}虚拟页{vpn}未映射物理页（缺页异常）")
-            return None, None
+        # 2. 先查软件TLB（仅虚拟地址空间内的页号参与，保证标签唯一）
+        in_range = 0 <= vpn < self.max_vpn
+        if in_range:
+            tag = (pid << 20) | vpn
+            tlb_index = self._tlb_index(pid, vpn)
+            entry = self._tlb[tlb_index]
+            if entry[0] == tag:
+                return (entry[1] << self.page_shift) | offset, entry[2]
 
-        # 4. 计算物理地址
-        pfn = page_table[vpn]
-        physical_addr = pfn * self.page_size + offset
+        # 3. 未命中：检查进程虚拟地址空间
+        slot = self.pid_slots.get(pid)
+        if slot is None:
+            logger.debug("[内存模块] 进程%s无虚拟地址空间，地址转换失败", pid)
+            return None, 0
 
-        # 5. 获取该虚拟页的权限
-        permission = self.process_vm[pid]["permissions"].get(vpn, "r")
+        # 4. 查页表获取物理页号（pfn）
+        index = slot * self.max_vpn + vpn
+        pfn = self.page_table[index] if in_range else -1
+        if pfn < 0:
+            logger.debug("[内存模块] 进程%s虚拟页%s未映射物理页（缺页异常）", pid, vpn)
+            return None, 0
 
-        return physical_addr, permission
+        # 5. 获取该虚拟页的权限并填充TLB
+        perm_code = self.perms[index]
+        self._tlb[tlb_index] = (tag, pfn, perm_code)
+
+        # 6. 计算物理地址
+        physical_addr = (pfn << self.page_shift) | offset
+        return physical_addr, perm_code
+
+    def translate_many(self, pid, addrs):
+        """
+        批量虚拟地址→物理地址转换（一次查找进程槽位，逐地址直接读扁平页表）
+        :param pid: 进程ID
+        :param addrs: 虚拟地址序列（整数）
+        :return: (物理地址列表, 权限列表)，转换失败的位置为 None
+        """
+        count = len(addrs)
+        slot = self.pid_slots.get(pid)
+        if slot is None:
+            logger.debug("[内存模块] 进程%s无虚拟地址空间，地址转换失败", pid)
+            return [None] * count, [None] * count
+
+        page_shift = self.page_shift
+        page_mask = self.page_mask
+        max_vpn = self.max_vpn
+        page_table = self.page_table
+        perms = self.perms
+        base = slot * max_vpn
+        physical_addrs = [None] * count
+        permissions = [None] * count
+        for i, virtual_addr in enumerate(addrs):
+            vpn = virtual_addr >> page_shift
+            if 0 <= vpn < max_vpn:
+                pfn = page_table[base + vpn]
+                if pfn >= 0:
+                    physical_addrs[i] = (pfn << page_shift) | (virtual_addr & page_mask)
+                    permissions[i] = PERM_NAMES[perms[base + vpn]]
+        return physical_addrs, permissions
+
+    @staticmethod
+    def _tlb_index(pid, vpn):
+        """TLB表项下标：乘法散列打散相邻 pid，再与 vpn 异或"""
+        return ((pid * 2654435761) ^ vpn) & (TLB_SIZE - 1)
+
+    def _tlb_invalidate(self, pid, vpn):
+        """击落 (pid, vpn) 的TLB表项（映射变更或释放时调用）"""
+        tlb_index = self._tlb_index(pid, vpn)
+        if self._tlb[tlb_index][0] == (pid << 20) | vpn:
+            self._tlb[tlb_index] = TLB_EMPTY
 
     def read_memory(self, pid, virtual_addr, length=4):
         """
@@ -131,30 +249,25 @@ class Memory:
         :return: 读取的数据（整数），失败返回 0
         """
         # 1. 地址转换
-        physical_addr, permission = self.translate_virtual_address(pid, virtual_addr)
-        if not physical_addr:
-            return 0
-
-        # 2. 权限检查（读操作需“r”或“rw”或“rx”权限）
-        if permission not in ["r", "rw", "rx"]:
-            print(f"[内存模块] 进程{pid}读虚拟地址{virtual_addr}：权限不足（当前权限{permission}）")
+        physical_addr, perm_code = self._translate(pid, virtual_addr)
+        if physical_addr is None:
             return 0
 
-        # 3. 检查物理页是否存在
-        pfn = physical_addr // self.page_size
-        if pfn not in self.physical_pages:
-            print(f"[内存模块] 物理页{pfn}不存在，读操作失败")
+        # 2. 权限检查（读操作需可读位：r/rw/rx 均具备）
+        if not perm_code & PERM_READ:
+            logger.debug("[内存模块] 进程%s读虚拟地址%s：权限不足（当前权限%s）", pid, virtual_addr, PERM_NAMES.get(perm_code))
             return 0
 
-        # 4. 读取页内数据（从物理页数据中截取偏移+长度的字节）
-        page_data = self.physical_pages[pfn]
-        offset = physical_addr % self.page_size
+        # 3. 读取页内数据（映射的页框必然已分配，直接按物理地址截取）
+        offset = physical_addr & self.page_mask
+        if length == 4 and offset + 4 <= self.page_size:
+            return _U32.unpack_from(self.ram, physical_addr)[0]  # 直接从物理内存解码，无中间对象
         # 确保读取长度不超出页边界
         if offset + length > self.page_size:
             length = self.page_size - offset
-        read_data = page_data[offset:offset+length]
+        read_data = self._ram_view[physical_addr:physical_addr+length]  # 零拷贝切片
 
-        # 5. 转换为整数（小端序，模拟x86架构）
+        # 4. 转换为整数（小端序，模拟x86架构）
         return int.from_bytes(read_data, byteorder="little", signed=False)
 
     def write_memory(self, pid, virtual_addr, data, length=4):
@@ -167,36 +280,31 @@ class Memory:
         :return: 成功返回 True，失败返回 False
         """
         # 1. 地址转换
-        physical_addr, permission = self.translate_virtual_address(pid, virtual_addr)
-        if not physical_addr:
+        physical_addr, perm_code = self._translate(pid, virtual_addr)
+        if physical_addr is None:
             return False
 
-        # 2. 权限检查（写操作需“rw”权限）
-        if permission != "rw":
-            print(f"[内存模块] 进程{pid}写虚拟地址{virtual_addr}：权限不足（当前权限{permission}）")
+        # 2. 权限检查（写操作需可写位：仅 rw 具备）
+        if not perm_code & PERM_WRITE:
+            logger.debug("[内存模块] 进程%s写虚拟地址%s：权限不足（当前权限%s）", pid, virtual_addr, PERM_NAMES.get(perm_code))
             return False
 
-        # 3. 检查物理页是否存在
-        pfn = physical_addr // self.page_size
-        if pfn not in self.physical_pages:
-            print(f"[内存模块] 物理页{pfn}不存在，写操作失败")
-            return False
-
-        # 4. 准备写入数据（转换为字节流，小端序）
-        page_data = bytearray(self.physical_pages[pfn])  # 转为可修改的字节数组
-        offset = physical_addr % self.page_size
-        # 确保写入长度不超出页边界
-        if offset + length > self.page_size:
-            length = self.page_size - offset
-        # 转换数据为字节流（不足补0）
-        data_bytes = data.to_bytes(length, byteorder="little", signed=False)
+        # 3. 准备写入数据（转换为字节流，小端序）
+        offset = physical_addr & self.page_mask
+        if length == 4 and offset + 4 <= self.page_size:
+            _U32.pack_into(self.ram, physical_addr, data)  # 直接编码进物理内存，无中间对象
+        else:
+            # 确保写入长度不超出页边界
+            if offset + length > self.page_size:
+                length = self.page_size - offset
+            # 转换数据为字节流（不足补0）
+            data_bytes = data.to_bytes(length, byteorder="little", signed=False)
 
-        # 5. 写入物理页
-        page_data[offset:offset+length] = data_bytes
-        self.physical_pages[pfn] = page_data  # 写回物理页
-        print(f"[内存模块] 进程{pid}：虚拟地址{virtual_addr}写入数据{data}（物理地址{physical_addr}）")
+            # 4. 按物理地址原地写入物理内存
+            self.ram[physical_addr:physical_addr+length] = data_bytes
+        logger.debug("[内存模块] 进程%s：虚拟地址%s写入数据%s（物理地址%s）", pid, virtual_addr, data, physical_addr)
         return True
 
     def get_free_memory_size(self):
         """获取空闲物理内存大小（模拟现代 OS 的 free 命令）"""
-        return len(self.free_page_frames) * self.page_size
\ No newline at end of file
+        return self.free_count * self.page_size
\ No newline at end of file
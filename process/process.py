@@ -1,15 +1,30 @@
+from enum import IntEnum
+import logging
+
+from cpu.cpu import ContextFrame
 from instructions.instruction import Instruction
 
+logger = logging.getLogger(__name__)
+
+# 内核进程无任务时返回的空指令（只读，预先构造一次，取指时直接复用）
+_IDLE_NOP = Instruction("kernel", "NOP", flags=["IDLE"])
+_SLEEP_NOP = Instruction("kernel", "NOP", flags=["SLEEP"])
+
+class PState(IntEnum):
+    """进程状态（整数枚举：状态比较即整数比较）"""
+    READY = 0
+    RUNNING = 1
+    BLOCKED = 2
+    TERMINATED = 3
+
+
 class PCB:
+    __slots__ = ("process", "context", "state", "priority", "time_slice")
+
     def __init__(self, process):
         self.process = process  # 关联的进程对象（UserProcess/KernelProcess）
-        self.context = {
-            "registers": {},
-            "flags": {},
-            "pc": 0,
-            "cpsr": "user" if isinstance(process, UserProcess) else "kernel"
-        }
-        self.state = "ready"  # 进程状态：ready/running/blocked
+        self.context = ContextFrame("user" if isinstance(process, UserProcess) else "kernel")
+        self.state = PState.READY  # 进程状态：PState
         self.priority = 1     # 优先级（数字越小优先级越高）
         self.time_slice = 0   # 已使用时间片
         
@@ -17,18 +32,19 @@ class PCB:
 class UserProcess:
     def __init__(self, pid, instructions):
         self.pid = pid  # 进程ID
-        self.instructions = instructions  # 指令列表（扩展Instruction对象）
+        self.type_name = "用户进程"
+        self.instructions = tuple(instructions)  # 指令序列（扩展Instruction对象，创建后不可变）
+        self._n = len(self.instructions)
 
-    def get_next_instruction(self, pc):
-        """根据PC获取下一条指令（PC越界则返回None，标识进程结束）"""
-        if 0 <= pc < len(self.instructions):
-            return self.instructions[pc]
-        return None
+    def get_next_instruction(self, pc=None):
+        """根据PC获取下一条指令（PC越界则返回None，标识进程结束；PC从0递增，不会为负）"""
+        return self.instructions[pc] if pc is not None and pc < self._n else None
 
 
 class KernelProcess:
     def __init__(self, pid, kernel, loop_strategy="on_demand"):
         self.pid = pid
+        self.type_name = "内核进程"
         self.kernel = kernel
         self.loop_strategy = loop_strategy  # 循环策略：always_loop/on_demand/once
         self.task_templates = {}  # 任务模板：{task_id: 指令列表}
@@ -39,30 +55,30 @@ class KernelProcess:
         """注册任务（内核进程的指令集合）"""
         if task_id not in self.task_templates:
             self.task_templates[task_id] = instructions
-            print(f"[内核进程{self.pid}] 注册任务：{task_id}（指令数：{len(instructions)}）")
+            logger.debug("[内核进程%s] 注册任务：%s（指令数：%s）", self.pid, task_id, len(instructions))
 
     def wake_up(self, task_id):
         """唤醒进程，指定执行的任务"""
         if task_id in self.task_templates:
             self.current_task = task_id
             self.current_pc = 0
-            print(f"[内核进程{self.pid}] 被唤醒，执行任务：{task_id}")
+            logger.debug("[内核进程%s] 被唤醒，执行任务：%s", self.pid, task_id)
 
-    def get_next_instruction(self):
-        """获取下一条指令（根据循环策略处理任务执行逻辑）"""
+    def get_next_instruction(self, pc=None):
+        """获取下一条指令（根据循环策略处理任务执行逻辑；pc 仅为与用户进程接口一致，忽略）"""
         if self.current_task is None:
             # 无任务时：根据策略返回空指令或None
             if self.loop_strategy == "always_loop":
-                return Instruction("kernel", "NOP", flags=["IDLE"])
+                return _IDLE_NOP
             elif self.loop_strategy == "on_demand":
-                return Instruction("kernel", "NOP", flags=["SLEEP"])
+                return _SLEEP_NOP
             else:
                 return None
 
         # 有任务时：获取当前任务的下一条指令
         task_instrs = self.task_templates[self.current_task]
         if self.current_pc >= len(task_instrs):
-            print(f"[内核进程{self.pid}] 任务 {self.current_task} 执行完毕")
+            logger.debug("[内核进程%s] 任务 %s 执行完毕", self.pid, self.current_task)
             # 任务结束后：根据循环策略决定是否重启
             if self.loop_strategy == "always_loop":
                 self.current_pc = 0
@@ -1,13 +1,16 @@
 # 运行示例
-import time
+import logging
+import os
 from kernel.kernel import Kernel
 
 if __name__ == "__main__":
+    # 硬件/进程跟踪日志默认关闭，设置 OSSIM_TRACE=1 开启（程序输出始终显示）
+    trace = bool(int(os.environ.get("OSSIM_TRACE", "0")))
+    logging.basicConfig(level=logging.DEBUG if trace else logging.INFO, format="%(message)s")
     kernel = Kernel()
     try:
         kernel.start()
-        while True:
-            time.sleep(1)
+        kernel.stop_event.wait()  # 调度循环退出后阻塞到关机信号，期间不产生周期性唤醒
     except KeyboardInterrupt:
         print("\n=== 系统关闭 ===")
-        kernel.clock.stop()
\ No newline at end of file
+        kernel.stop()
\ No newline at end of file